@@ -20,6 +20,9 @@ class WindowsResourceFileHelper(object):
   _MESSAGE_STRING_PLACE_HOLDER_SPECIFIER_RE = re.compile(
       r'%([1-9][0-9]?)[!]?[s]?[!]?')
 
+  # Characters that require a message string to be formatted.
+  _MESSAGE_STRING_SPECIAL_CHARACTERS = frozenset('%\r\n{}')
+
   @classmethod
   def _MessageStringPlaceHolderSpecifierReplacer(cls, match_object):
     """Replaces message string place holders into Python format() style.
@@ -57,6 +60,12 @@ class WindowsResourceFileHelper(object):
       return None
 
     message_string = message_string.rstrip('\0')
+
+    # Most message strings contain place holders, however the ones that do
+    # not contain any special characters need no further formatting.
+    if cls._MESSAGE_STRING_SPECIAL_CHARACTERS.isdisjoint(message_string):
+      return message_string
+
     message_string = cls._MESSAGE_STRING_WHITE_SPACE_SPECIFIER_RE.sub(
         r'', message_string)
     message_string = cls._MESSAGE_STRING_TEXT_SPECIFIER_RE.sub(
@@ -1,9 +1,13 @@
 # -*- coding: utf-8 -*-
 """Windows EventLog resources database reader."""
 
+import atexit
 import collections
+import functools
 import os
+import pathlib
 import sqlite3
+import threading
 
 from acstore import sqlite_store
 from acstore.containers import interface as containers_interface
@@ -14,21 +18,121 @@ from plaso.helpers.windows import resource_files
 from plaso.output import logger
 
 
+@functools.lru_cache(maxsize=8192)
+def _FormatMessageStringInPEP3101(message_string):
+  """Formats a message string in Python format() (PEP 3101) style.
+
+  The formatted message strings are cached, since the same message strings
+  are formatted for many events.
+
+  Args:
+    message_string (str): message string.
+
+  Returns:
+    str: message string in Python format() (PEP 3101) style.
+  """
+  return resource_files.WindowsResourceFileHelper.FormatMessageStringInPEP3101(
+      message_string)
+
+
+@functools.lru_cache(maxsize=256)
+def _GetLowerCaseLanguageTagForLCID(lcid):
+  """Retrieves the lower case language tag for a specific LCID.
+
+  Args:
+    lcid (int): Windows Language Code Identifier (LCID).
+
+  Returns:
+    str: lower case language tag, such as "en-us".
+  """
+  language_tag = languages.WindowsLanguageHelper.GetLanguageTagForLCID(lcid)
+  return language_tag.lower()
+
+
 class Sqlite3DatabaseFile(object):
   """Class that defines a sqlite3 database file."""
 
-  _HAS_TABLE_QUERY = (
-      'SELECT name FROM sqlite_master '
-      'WHERE type = "table" AND name = "{0:s}"')
+  _COLUMN_TYPES_QUERY = 'SELECT name, type FROM pragma_table_info(?)'
+
+  _TABLE_NAMES_QUERY = "SELECT name FROM sqlite_master WHERE type = 'table'"
+
+  # The maximum number of prepared statements sqlite3 keeps per connection.
+  _MAXIMUM_CACHED_STATEMENTS = 512
+
+  # Pragmas to apply when the database is opened, the page cache size is
+  # 64 MiB and the memory-mapped I/O size 256 MiB.
+  _PRAGMAS = [
+      'PRAGMA temp_store = MEMORY',
+      'PRAGMA cache_size = -65536',
+      'PRAGMA mmap_size = 268435456']
 
   def __init__(self):
     """Initializes the database file object."""
     super(Sqlite3DatabaseFile, self).__init__()
     self._connection = None
     self._cursor = None
+    self._sql_queries = {}
+    self._table_names = set()
     self.filename = None
     self.read_only = None
 
+  def _GetSQLQuery(self, table_names, column_names, condition, limit=None):
+    """Retrieves a SQL query.
+
+    Args:
+      table_names (list[str]): table names.
+      column_names (list[str]): column names.
+      condition (str): query condition such as "log_source == ?", where values
+          are bound using placeholders.
+      limit (Optional[int]): maximum number of rows to retrieve.
+
+    Returns:
+      str: SQL query.
+
+    Raises:
+      RuntimeError: if a column name is not defined in the tables.
+    """
+    lookup_key = (tuple(table_names), tuple(column_names), condition, limit)
+    sql_query = self._sql_queries.get(lookup_key, None)
+    if not sql_query:
+      # SQLite treats a double-quoted identifier that does not match a column
+      # as a string literal, hence column names are checked explicitly.
+      defined_column_names = set()
+      for table_name in table_names:
+        defined_column_names.update(self.GetColumnTypes(table_name).keys())
+
+      for column_name in column_names:
+        if column_name not in defined_column_names:
+          raise RuntimeError(f'Unsupported column name: {column_name:s}')
+
+      table_names_string = ', '.join([
+          self._QuoteIdentifier(table_name) for table_name in table_names])
+      column_names_string = ', '.join([
+          self._QuoteIdentifier(column_name) for column_name in column_names])
+      sql_query = f'SELECT {column_names_string:s} FROM {table_names_string:s}'
+
+      if condition:
+        sql_query = f'{sql_query:s} WHERE {condition:s}'
+
+      if limit is not None:
+        sql_query = f'{sql_query:s} LIMIT {limit:d}'
+
+      self._sql_queries[lookup_key] = sql_query
+
+    return sql_query
+
+  def _QuoteIdentifier(self, identifier):
+    """Quotes an identifier, such as a table or column name.
+
+    Args:
+      identifier (str): identifier.
+
+    Returns:
+      str: quoted identifier that can be safely used in a SQL query.
+    """
+    escaped_identifier = identifier.replace('"', '""')
+    return f'"{escaped_identifier:s}"'
+
   def Close(self):
     """Closes the database file.
 
@@ -44,6 +148,8 @@ class Sqlite3DatabaseFile(object):
 
     self._connection = None
     self._cursor = None
+    self._sql_queries = {}
+    self._table_names = set()
     self.filename = None
     self.read_only = None
 
@@ -63,51 +169,89 @@ class Sqlite3DatabaseFile(object):
       raise RuntimeError(
           'Cannot determine if table exists database not opened.')
 
-    sql_query = self._HAS_TABLE_QUERY.format(table_name)
+    return table_name in self._table_names
+
+  def GetColumnTypes(self, table_name):
+    """Retrieves the declared types of the columns of a specific table.
+
+    Args:
+      table_name (str): table name.
+
+    Returns:
+      dict[str, str]: declared type per column name.
+
+    Raises:
+      RuntimeError: if the database is not opened.
+    """
+    if not self._connection:
+      raise RuntimeError('Cannot retrieve column types database not opened.')
+
+    self._cursor.execute(self._COLUMN_TYPES_QUERY, (table_name, ))
+
+    return {values['name']: values['type'] for values in self._cursor}
+
+  def GetSingleValue(
+      self, table_name, column_names, condition, parameters=None):
+    """Retrieves a single row of values from a table.
+
+    Args:
+      table_name (str): table name.
+      column_names (list[str]): column names.
+      condition (str): query condition such as "log_source == ?", where values
+          are bound using placeholders.
+      parameters (Optional[tuple[object]]): values of the placeholders in
+          the query condition.
+
+    Returns:
+      sqlite3.Row: row, where values can be accessed by column name, or None
+          if not available.
+
+    Raises:
+      RuntimeError: if the database is not opened, if a column name is not
+          defined in the table or if more than one row is found in the
+          database.
+    """
+    if not self._connection:
+      raise RuntimeError('Cannot retrieve value database not opened.')
 
-    self._cursor.execute(sql_query)
-    if self._cursor.fetchone():
-      return True
+    # A limit of 2 is used to detect if there is more than one matching row.
+    sql_query = self._GetSQLQuery(
+        [table_name], column_names, condition, limit=2)
 
-    return False
+    self._cursor.execute(sql_query, parameters or ())
 
-  def GetValues(self, table_names, column_names, condition):
+    row = self._cursor.fetchone()
+    if row and self._cursor.fetchone():
+      raise RuntimeError('More than one value found in database.')
+
+    return row
+
+  def GetValues(self, table_names, column_names, condition, parameters=None):
     """Retrieves values from a table.
 
     Args:
       table_names (list[str]): table names.
       column_names (list[str]): column names.
-      condition (str): query condition such as
-          "log_source == 'Application Error'".
+      condition (str): query condition such as "log_source == ?", where values
+          are bound using placeholders.
+      parameters (Optional[tuple[object]]): values of the placeholders in
+          the query condition.
 
     Yields:
-      sqlite3.row: row.
+      sqlite3.Row: row, where values can be accessed by column name.
 
     Raises:
-      RuntimeError: if the database is not opened.
+      RuntimeError: if the database is not opened or if a column name is not
+          defined in the tables.
     """
     if not self._connection:
       raise RuntimeError('Cannot retrieve values database not opened.')
 
-    if condition:
-      condition = f' WHERE {condition:s}'
-    else:
-      condition = ''
-
-    table_names_string = ', '.join(table_names)
-    column_names_string = ', '.join(column_names)
-    sql_query = (
-        f'SELECT {column_names_string:s} FROM {table_names_string:s}'
-        f'{condition:s}')
-
-    self._cursor.execute(sql_query)
+    sql_query = self._GetSQLQuery(table_names, column_names, condition)
 
-    # TODO: have a look at https://docs.python.org/2/library/
-    # sqlite3.html#sqlite3.Row.
-    for row in self._cursor:
-      yield {
-          column_name: row[column_index]
-          for column_index, column_name in enumerate(column_names)}
+    # A cursor is used per query, so that stopping iteration early cannot
+    # close a cursor another query is using.
+    yield from self._connection.execute(sql_query, parameters or ())
 
   def Open(self, filename, read_only=False):
     """Opens the database file.
@@ -115,8 +259,8 @@ class Sqlite3DatabaseFile(object):
     Args:
       filename (str): filename of the database.
       read_only (Optional[bool]): True if the database should be opened in
-          read-only mode. Since sqlite3 does not support a real read-only
-          mode we fake it by only permitting SELECT queries.
+          read-only mode. In read-only mode the database is opened as
+          immutable, which disables locking and change detection.
 
     Returns:
       bool: True if successful.
@@ -130,29 +274,68 @@ class Sqlite3DatabaseFile(object):
     self.filename = filename
     self.read_only = read_only
 
+    if read_only:
+      database_uri = pathlib.Path(filename).absolute().as_uri()
+      database_uri = f'{database_uri:s}?mode=ro&immutable=1'
+    else:
+      database_uri = filename
+
     try:
-      self._connection = sqlite3.connect(filename)
+      self._connection = sqlite3.connect(
+          database_uri, cached_statements=self._MAXIMUM_CACHED_STATEMENTS,
+          check_same_thread=not read_only, uri=read_only)
     except sqlite3.OperationalError:
       return False
 
     if not self._connection:
       return False
 
+    pragmas = list(self._PRAGMAS)
+    if read_only:
+      pragmas.append('PRAGMA query_only = 1')
+
+    try:
+      for pragma in pragmas:
+        self._connection.execute(pragma)
+
+    except sqlite3.DatabaseError:
+      self._connection.close()
+      self._connection = None
+      return False
+
+    self._connection.row_factory = sqlite3.Row
+
     self._cursor = self._connection.cursor()
     if not self._cursor:
       return False
 
+    # The table names are read once since the database schema is not changed
+    # while the database is open.
+    self._table_names = {
+        values[0] for values in self._cursor.execute(self._TABLE_NAMES_QUERY)}
+
     return True
 
 
 class WinevtResourcesSqlite3DatabaseReader(object):
   """Windows EventLog resources SQLite database reader."""
 
+  # Value of messages with more than one message string in a message table.
+  _AMBIGUOUS_MESSAGE_STRING = object()
+
+  # Maximum number of message tables to cache.
+  _MAXIMUM_CACHED_MESSAGE_TABLES = 32
+
   def __init__(self):
     """Initializes a Windows EventLog resources SQLite database reader."""
     super(WinevtResourcesSqlite3DatabaseReader, self).__init__()
+    self._ambiguous_log_sources = set()
     self._database_file = Sqlite3DatabaseFile()
-    self._resouce_file_helper = resource_files.WindowsResourceFileHelper
+    self._event_log_provider_keys = {}
+    self._matching_message_file_keys = {}
+    self._message_file_keys = {}
+    self._message_identifier_is_integer = None
+    self._message_tables = collections.OrderedDict()
     self._string_format = 'wrc'
 
   def _GetEventLogProviderKey(self, log_source):
@@ -162,27 +345,15 @@ class WinevtResourcesSqlite3DatabaseReader(object):
       log_source (str): EventLog source.
 
     Returns:
-      str: EventLog provider key or None if not available.
+      int: EventLog provider key or None if not available.
 
     Raises:
       RuntimeError: if more than one value is found in the database.
     """
-    table_names = ['event_log_providers']
-    column_names = ['event_log_provider_key']
-    condition = f'log_source == "{log_source:s}"'
+    if log_source in self._ambiguous_log_sources:
+      raise RuntimeError('More than one value found in database.')
 
-    values_list = list(self._database_file.GetValues(
-        table_names, column_names, condition))
-
-    number_of_values = len(values_list)
-    if number_of_values == 0:
-      return None
-
-    if number_of_values == 1:
-      values = values_list[0]
-      return values['event_log_provider_key']
-
-    raise RuntimeError('More than one value found in database.')
+    return self._event_log_provider_keys.get(log_source, None)
 
   def _GetMessage(self, message_file_key, lcid, message_identifier):
     """Retrieves a specific message from a specific message table.
@@ -198,26 +369,30 @@ class WinevtResourcesSqlite3DatabaseReader(object):
     Raises:
       RuntimeError: if more than one value is found in the database.
     """
-    table_name = f'message_table_{message_file_key:d}_0x{lcid:08x}'
-
-    has_table = self._database_file.HasTable(table_name)
-    if not has_table:
-      return None
-
-    column_names = ['message_string']
-    condition = f'message_identifier == "0x{message_identifier:08x}"'
+    lookup_key = (message_file_key, lcid)
+    if lookup_key in self._message_tables:
+      message_table = self._message_tables[lookup_key]
+      self._message_tables.move_to_end(lookup_key)
+    else:
+      message_table = self._ReadMessageTable(message_file_key, lcid)
+      if len(self._message_tables) >= self._MAXIMUM_CACHED_MESSAGE_TABLES:
+        self._message_tables.popitem(last=False)
 
-    values = list(self._database_file.GetValues(
-        [table_name], column_names, condition))
+      self._message_tables[lookup_key] = message_table
 
-    number_of_values = len(values)
-    if number_of_values == 0:
+    if not message_table:
       return None
 
-    if number_of_values == 1:
-      return values[0]['message_string']
+    # The message identifier is typically stored as a string of its
+    # hexadecimal representation, such as "0x00000001".
+    if not self._message_identifier_is_integer:
+      message_identifier = f'0x{message_identifier:08x}'
 
-    raise RuntimeError('More than one value found in database.')
+    message_string = message_table.get(message_identifier, None)
+    if message_string is self._AMBIGUOUS_MESSAGE_STRING:
+      raise RuntimeError('More than one value found in database.')
+
+    return message_string
 
   def _GetMessageFileKeys(self, event_log_provider_key):
     """Retrieves the message file keys.
@@ -225,22 +400,99 @@ class WinevtResourcesSqlite3DatabaseReader(object):
     Args:
       event_log_provider_key (int): EventLog provider key.
 
-    Yields:
-      int: message file key.
+    Returns:
+      list[int]: message file keys.
+    """
+    return self._message_file_keys.get(event_log_provider_key, [])
+
+  def _ReadEventLogProviderKeys(self):
+    """Reads the EventLog provider keys.
+
+    Raises:
+      RuntimeError: if the database is not opened.
+    """
+    self._ambiguous_log_sources = set()
+    self._event_log_provider_keys = {}
+
+    if self._database_file.HasTable('event_log_providers'):
+      column_names = ['log_source', 'event_log_provider_key']
+      for log_source, event_log_provider_key in self._database_file.GetValues(
+          ['event_log_providers'], column_names, None):
+        if log_source in self._event_log_provider_keys:
+          self._ambiguous_log_sources.add(log_source)
+
+        self._event_log_provider_keys[log_source] = event_log_provider_key
+
+  def _ReadMessageFileKeys(self):
+    """Reads the message file keys per EventLog provider key.
+
+    Raises:
+      RuntimeError: if the database is not opened.
     """
-    table_names = ['message_file_per_event_log_provider']
-    column_names = ['message_file_key']
-    condition = f'event_log_provider_key == {event_log_provider_key:d}'
+    self._message_file_keys = collections.defaultdict(list)
+
+    if self._database_file.HasTable('message_file_per_event_log_provider'):
+      column_names = ['event_log_provider_key', 'message_file_key']
+      for event_log_provider_key, message_file_key in (
+          self._database_file.GetValues(
+              ['message_file_per_event_log_provider'], column_names, None)):
+        self._message_file_keys[event_log_provider_key].append(
+            message_file_key)
+
+  def _ReadMessageTable(self, message_file_key, lcid):
+    """Reads a specific message table.
+
+    Message strings are read per message table, with a single query, rather
+    than per message, since most messages of a message table that is used
+    are typically used as well. Only the most recently used message tables
+    are cached, see _MAXIMUM_CACHED_MESSAGE_TABLES.
+
+    Args:
+      message_file_key (int): message file key.
+      lcid (int): language code identifier (LCID).
+
+    Returns:
+      dict[object, object]: message strings per message identifier or None if
+          the message table is not available. Messages with more than one
+          message string are set to _AMBIGUOUS_MESSAGE_STRING.
+
+    Raises:
+      RuntimeError: if the database is not opened.
+    """
+    table_name = f'message_table_{message_file_key:d}_0x{lcid:08x}'
+    if not self._database_file.HasTable(table_name):
+      return None
 
-    generator = self._database_file.GetValues(
-        table_names, column_names, condition)
-    for values in generator:
-      yield values['message_file_key']
+    if self._message_identifier_is_integer is None:
+      column_types = self._database_file.GetColumnTypes(table_name)
+      column_type = column_types.get('message_identifier', None) or ''
+      # Columns of which the declared type contains "INT" have integer
+      # affinity in SQLite.
+      self._message_identifier_is_integer = 'INT' in column_type.upper()
+
+    message_table = {}
+
+    column_names = ['message_identifier', 'message_string']
+    for message_identifier, message_string in self._database_file.GetValues(
+        [table_name], column_names, None):
+      if message_identifier in message_table:
+        message_string = self._AMBIGUOUS_MESSAGE_STRING
+
+      message_table[message_identifier] = message_string
+
+    return message_table
 
   def Close(self):
     """Closes the database reader object."""
     self._database_file.Close()
 
+    self._ambiguous_log_sources = set()
+    self._event_log_provider_keys = {}
+    self._matching_message_file_keys = {}
+    self._message_file_keys = {}
+    self._message_identifier_is_integer = None
+    self._message_tables = collections.OrderedDict()
+
   def GetMessage(self, log_source, lcid, message_identifier):
     """Retrieves a specific message for a specific EventLog source.
 
@@ -256,23 +508,36 @@ class WinevtResourcesSqlite3DatabaseReader(object):
     if not event_log_provider_key:
       return None
 
-    generator = self._GetMessageFileKeys(event_log_provider_key)
-    if not generator:
+    message_file_keys = self._GetMessageFileKeys(event_log_provider_key)
+    if not message_file_keys:
       return None
 
+    # The message file that previously contained the message is tried first,
+    # since the database is immutable it will contain the message again.
+    lookup_key = (event_log_provider_key, lcid, message_identifier)
+    matching_message_file_key = self._matching_message_file_keys.get(
+        lookup_key, None)
+
     message_string = None
-    for message_file_key in generator:
+    if matching_message_file_key is not None:
       message_string = self._GetMessage(
-          message_file_key, lcid, message_identifier)
+          matching_message_file_key, lcid, message_identifier)
 
-      if message_string:
-        break
+    if not message_string:
+      for message_file_key in message_file_keys:
+        if message_file_key == matching_message_file_key:
+          continue
 
-    if self._string_format == 'wrc':
-      message_string = self._resouce_file_helper.FormatMessageStringInPEP3101(
-          message_string)
+        message_string = self._GetMessage(
+            message_file_key, lcid, message_identifier)
+        if message_string:
+          self._matching_message_file_keys[lookup_key] = message_file_key
+          break
 
-    return message_string
+    if self._string_format == 'wrc' and message_string:
+      message_string = _FormatMessageStringInPEP3101(message_string)
+
+    return message_string or None
 
   def GetMetadataAttribute(self, attribute_name):
     """Retrieves the metadata attribute.
@@ -293,19 +558,14 @@ class WinevtResourcesSqlite3DatabaseReader(object):
       return None
 
     column_names = ['value']
-    condition = f'name == "{attribute_name:s}"'
+    condition = 'name == ?'
 
-    values = list(self._database_file.GetValues(
-        [table_name], column_names, condition))
-
-    number_of_values = len(values)
-    if number_of_values == 0:
+    values = self._database_file.GetSingleValue(
+        table_name, column_names, condition, parameters=(attribute_name, ))
+    if not values:
       return None
 
-    if number_of_values == 1:
-      return values[0]['value']
-
-    raise RuntimeError('More than one value found in database.')
+    return values['value']
 
   def Open(self, filename):
     """Opens the database reader object.
@@ -335,6 +595,10 @@ class WinevtResourcesSqlite3DatabaseReader(object):
       raise RuntimeError(f'Unsupported string format: {string_format:s}')
 
     self._string_format = string_format
+
+    self._ReadEventLogProviderKeys()
+    self._ReadMessageFileKeys()
+
     return True
 
 
@@ -644,8 +908,20 @@ class WinevtResourcesHelper(object):
   # The maximum number of cached message strings
   _MAXIMUM_CACHED_MESSAGE_STRINGS = 64 * 1024
 
+  # Value cached for message strings that are not available, to prevent
+  # them from being looked up repeatedly.
+  _MESSAGE_STRING_NOT_AVAILABLE = object()
+
   _WINEVT_RC_DATABASE = 'winevt-rc.db'
 
+  # Windows EventLog resource database readers shared by the helpers per
+  # process, thread and database path. The readers are not shared across
+  # processes, since forked processes inherit the cache, or across threads,
+  # since the attribute container store can only be used by the thread that
+  # opened it. The readers are stored per thread, rather than by thread
+  # identifier, since identifiers are reused after a thread has exited.
+  _thread_local = threading.local()
+
   def __init__(self, storage_reader, data_location, lcid):
     """Initializes Windows EventLog resources helper.
 
@@ -654,16 +930,18 @@ class WinevtResourcesHelper(object):
       data_location (str): data location of the winevt-rc database.
       lcid (int): Windows Language Code Identifier (LCID).
     """
-    language_tag = languages.WindowsLanguageHelper.GetLanguageTagForLCID(
-        lcid or self.DEFAULT_LCID)
-
     super(WinevtResourcesHelper, self).__init__()
     self._data_location = data_location
     self._environment_variables = None
-    self._language_tag = language_tag.lower()
+    self._event_message_file_identifiers = {}
+    self._language_tag = _GetLowerCaseLanguageTagForLCID(
+        lcid or self.DEFAULT_LCID)
     self._lcid = lcid or self.DEFAULT_LCID
-    self._message_string_cache = collections.OrderedDict()
-    self._resouce_file_helper = resource_files.WindowsResourceFileHelper
+    self._lookup_paths_cache = {}
+    self._message_string_cache = {}
+    self._message_string_cache_keys = collections.deque()
+    self._parameter_message_file_identifiers = {}
+    self._providers_cache = {}
     self._storage_reader = None
     self._windows_eventlog_message_files = None
     self._windows_eventlog_providers = None
@@ -673,67 +951,74 @@ class WinevtResourcesHelper(object):
         'windows_eventlog_provider'):
       self._storage_reader = storage_reader
 
-  def _CacheMessageString(
-      self, provider_identifier, log_source, message_identifier,
-      event_version, message_string):
+  def _CacheMessageString(self, lookup_key, message_string):
     """Caches a specific message string.
 
+    When the cache is full the message string that was cached first is
+    removed from the cache.
+
     Args:
-      provider_identifier (str): EventLog provider identifier.
-      log_source (str): EventLog source, such as "Application Error".
-      message_identifier (int): message identifier.
-      event_version (int): event version or None if not set.
-      message_string (str): message string.
+      lookup_key (tuple): lookup key of the message string.
+      message_string (object): message string or _MESSAGE_STRING_NOT_AVAILABLE
+          if the message string is not available.
     """
-    if len(self._message_string_cache) >= self._MAXIMUM_CACHED_MESSAGE_STRINGS:
-      self._message_string_cache.popitem(last=True)
+    if lookup_key not in self._message_string_cache:
+      if len(self._message_string_cache_keys) >= (
+          self._MAXIMUM_CACHED_MESSAGE_STRINGS):
+        oldest_lookup_key = self._message_string_cache_keys.popleft()
+        del self._message_string_cache[oldest_lookup_key]
 
-    if provider_identifier:
-      lookup_key = f'{provider_identifier:s}:0x{message_identifier:08x}'
-      if event_version is not None:
-        lookup_key = f'{lookup_key:s}:{event_version:d}'
-      self._message_string_cache[lookup_key] = message_string
-      self._message_string_cache.move_to_end(lookup_key, last=False)
+      self._message_string_cache_keys.append(lookup_key)
 
-    if log_source:
-      lookup_key = f'{log_source:s}:0x{message_identifier:08x}'
-      if event_version is not None:
-        lookup_key = f'{lookup_key:s}:{event_version:d}'
-      self._message_string_cache[lookup_key] = message_string
-      self._message_string_cache.move_to_end(lookup_key, last=False)
+    self._message_string_cache[lookup_key] = message_string
 
-  def _GetCachedMessageString(
-      self, provider_identifier, log_source, message_identifier, event_version):
-    """Retrieves a specific cached message string.
+  def _GetAnyValueFilterExpression(
+      self, attribute_name, values, filter_expression):
+    """Retrieves a filter expression that matches any of the attribute values.
+
+    The filter expression is repeated for each value, since the SQLite
+    attribute container store does not preserve parentheses when converting
+    the filter expression to SQL.
 
     Args:
-      provider_identifier (str): EventLog provider identifier.
-      log_source (str): EventLog source, such as "Application Error".
-      message_identifier (int): message identifier.
-      event_version (int): event version or None if not set.
+      attribute_name (str): name of the attribute.
+      values (list[str]): attribute values of which any should match.
+      filter_expression (str): filter expression that should match as well.
 
     Returns:
-      str: message string or None if not available.
+      str: filter expression.
     """
-    lookup_key = None
-    message_string = None
+    return ' or '.join([
+        f'{attribute_name:s} == "{value:s}" and {filter_expression:s}'
+        for value in values])
 
-    if provider_identifier:
-      lookup_key = f'{provider_identifier:s}:0x{message_identifier:08x}'
-      if event_version is not None:
-        lookup_key = f'{lookup_key:s}:{event_version:d}'
-      message_string = self._message_string_cache.get(lookup_key, None)
+  def _GetCachedMessageString(self, lookup_key):
+    """Retrieves a specific cached message string.
 
-    if not message_string and log_source:
-      lookup_key = f'{log_source:s}:0x{message_identifier:08x}'
-      if event_version is not None:
-        lookup_key = f'{lookup_key:s}:{event_version:d}'
-      message_string = self._message_string_cache.get(lookup_key, None)
+    Args:
+      lookup_key (tuple): lookup key of the message string.
 
-    if message_string:
-      self._message_string_cache.move_to_end(lookup_key, last=False)
+    Returns:
+      object: message string, _MESSAGE_STRING_NOT_AVAILABLE if the message
+          string is cached as not available or None if not cached.
+    """
+    return self._message_string_cache.get(lookup_key, None)
 
-    return message_string
+  @classmethod
+  def _GetDatabaseReaders(cls):
+    """Retrieves the shared database readers of the current thread.
+
+    Returns:
+      dict[tuple[int, str], object]: Windows EventLog resource database
+          reader or None if not available, per process identifier and
+          database path.
+    """
+    database_readers = getattr(cls._thread_local, 'database_readers', None)
+    if database_readers is None:
+      database_readers = {}
+      cls._thread_local.database_readers = database_readers
+
+    return database_readers
 
   def _GetEventMessageFileIdentifiers(self, message_files):
     """Retrieves event message file identifiers.
@@ -746,20 +1031,27 @@ class WinevtResourcesHelper(object):
     """
     message_file_identifiers = []
     for windows_path in message_files or []:
-      path, filename = path_helper.PathHelper.GetWindowsSystemPath(
-          windows_path, self._environment_variables)
+      lookup_paths = self._lookup_paths_cache.get(windows_path, None)
+      if not lookup_paths:
+        path, filename = path_helper.PathHelper.GetWindowsSystemPath(
+            windows_path, self._environment_variables)
+
+        mui_filename = f'{filename:s}.mui'
+        lookup_paths = (
+            '\\'.join([path, filename]).lower(),
+            '\\'.join([path, self._language_tag, mui_filename]).lower())
+        self._lookup_paths_cache[windows_path] = lookup_paths
+
+      lookup_path, mui_lookup_path = lookup_paths
 
-      lookup_path = '\\'.join([path, filename]).lower()
       message_file_identifier = self._windows_eventlog_message_files.get(
           lookup_path, None)
       if message_file_identifier:
         message_file_identifier = message_file_identifier.CopyToString()
         message_file_identifiers.append(message_file_identifier)
 
-      mui_filename = f'{filename:s}.mui'
-      lookup_path = '\\'.join([path, self._language_tag, mui_filename]).lower()
       message_file_identifier = self._windows_eventlog_message_files.get(
-          lookup_path, None)
+          mui_lookup_path, None)
       if message_file_identifier:
         message_file_identifier = message_file_identifier.CopyToString()
         message_file_identifiers.append(message_file_identifier)
@@ -803,6 +1095,31 @@ class WinevtResourcesHelper(object):
 
     return message_identifier
 
+  def _GetMessageStringLookupKey(
+      self, provider_identifier, log_source, message_identifier, event_version):
+    """Retrieves the lookup key of a specific message string.
+
+    The message string is cached only once, under the EventLog provider
+    identifier if available, otherwise under the EventLog source.
+
+    Args:
+      provider_identifier (str): EventLog provider identifier.
+      log_source (str): EventLog source, such as "Application Error".
+      message_identifier (int): message identifier.
+      event_version (int): event version or None if not set.
+
+    Returns:
+      tuple[str, int, int]: lookup key or None if neither the EventLog
+          provider identifier nor source are set.
+    """
+    lookup_key = provider_identifier or log_source
+    if not lookup_key:
+      return None
+
+    # A tuple is used as lookup key since it is considerably cheaper to
+    # construct than a formatted string.
+    return lookup_key, message_identifier, event_version
+
   def _GetMessageStrings(
       self, storage_reader, message_file_identifiers, message_identifier):
     """Retrieves message strings.
@@ -815,21 +1132,13 @@ class WinevtResourcesHelper(object):
     Returns:
       list[str]: message strings.
     """
-    message_strings = []
+    filter_expression = self._GetAnyValueFilterExpression(
+        '_message_file_identifier', message_file_identifiers, (
+            f'language_identifier == {self._lcid:d} and '
+            f'message_identifier == {message_identifier:d}'))
 
-    # TODO: add message_file_identifiers to filter_expression
-    filter_expression = (
-        f'language_identifier == {self._lcid:d} and '
-        f'message_identifier == {message_identifier:d}')
-
-    for message_string in storage_reader.GetAttributeContainers(
-        'windows_eventlog_message_string', filter_expression=filter_expression):
-      identifier = message_string.GetMessageFileIdentifier()
-      identifier = identifier.CopyToString()
-      if identifier in message_file_identifiers:
-        message_strings.append(message_string)
-
-    return message_strings
+    return list(storage_reader.GetAttributeContainers(
+        'windows_eventlog_message_string', filter_expression=filter_expression))
 
   def _GetMessageStringsWithMessageTable(
       self, storage_reader, message_file_identifiers, message_identifier):
@@ -841,36 +1150,101 @@ class WinevtResourcesHelper(object):
       message_identifier (int): message identifier.
 
     Returns:
-      list[str]: message strings.
+      list[str]: message strings, in order of the message file identifiers.
     """
-    message_strings = []
+    filter_expression = self._GetAnyValueFilterExpression(
+        '_message_file_identifier', message_file_identifiers,
+        f'language_identifier == {self._lcid:d}')
 
-    for message_file_identifier in message_file_identifiers:
-      filter_expression = (
-          f'_message_file_identifier == "{message_file_identifier:s}" and '
-          f'language_identifier == {self._lcid:d}')
-      for message_table in storage_reader.GetAttributeContainers(
-          'winevtrc_message_table', filter_expression=filter_expression):
-        if not message_table:
-          continue
+    message_file_identifier_per_message_table = {}
+    for message_table in storage_reader.GetAttributeContainers(
+        'winevtrc_message_table', filter_expression=filter_expression):
+      if not message_table:
+        continue
 
-        identifier = message_table.GetIdentifier()
-        message_table_identifier = identifier.CopyToString()
+      identifier = message_table.GetIdentifier()
+      message_table_identifier = identifier.CopyToString()
 
-        filter_expression = (
-            f'_message_table_identifier == "{message_table_identifier:s}" and '
-            f'message_identifier == {message_identifier:d}')
+      identifier = message_table.GetMessageFileIdentifier()
+      message_file_identifier_per_message_table[message_table_identifier] = (
+          identifier.CopyToString())
+
+    if not message_file_identifier_per_message_table:
+      return []
+
+    filter_expression = self._GetAnyValueFilterExpression(
+        '_message_table_identifier',
+        list(message_file_identifier_per_message_table.keys()),
+        f'message_identifier == {message_identifier:d}')
 
-        identifier = message_table.GetMessageFileIdentifier()
-        message_file_identifier = identifier.CopyToString()
+    message_strings_per_message_file = collections.defaultdict(list)
+    for message_string in storage_reader.GetAttributeContainers(
+        'winevtrc_message_string', filter_expression=filter_expression):
+      identifier = message_string.GetMessageTableIdentifier()
+      message_file_identifier = message_file_identifier_per_message_table.get(
+          identifier.CopyToString(), None)
+      message_strings_per_message_file[message_file_identifier].append(
+          message_string)
 
-        for message_string in storage_reader.GetAttributeContainers(
-            'winevtrc_message_string', filter_expression=filter_expression):
-          if message_file_identifier in message_file_identifiers:
-            message_strings.append(message_string)
+    message_strings = []
+    for message_file_identifier in message_file_identifiers:
+      message_strings.extend(message_strings_per_message_file.get(
+          message_file_identifier, []))
 
     return message_strings
 
+  def _GetProviderEventMessageFileIdentifiers(self, provider):
+    """Retrieves the event message file identifiers of a provider.
+
+    Args:
+      provider (WindowsEventLogProviderArtifact): Windows EventLog provider.
+
+    Returns:
+      list[str]: message file identifiers.
+    """
+    # The providers are kept in _windows_eventlog_providers, hence their
+    # identity does not change while the message file identifiers are cached.
+    lookup_key = id(provider)
+
+    message_file_identifiers = self._event_message_file_identifiers.get(
+        lookup_key, None)
+    if message_file_identifiers is None:
+      message_file_identifiers = self._GetEventMessageFileIdentifiers(
+          provider.event_message_files)
+      self._event_message_file_identifiers[lookup_key] = (
+          message_file_identifiers)
+
+    return message_file_identifiers
+
+  def _GetProviderParameterMessageFileIdentifiers(self, provider):
+    """Retrieves the parameter message file identifiers of a provider.
+
+    Args:
+      provider (WindowsEventLogProviderArtifact): Windows EventLog provider.
+
+    Returns:
+      list[str]: message file identifiers.
+    """
+    lookup_key = id(provider)
+
+    message_file_identifiers = self._parameter_message_file_identifiers.get(
+        lookup_key, None)
+    if message_file_identifiers is None:
+      message_files = provider.parameter_message_files
+      if not message_files:
+        # If no parameter message files are defined fallback to the event
+        # message files and default parameter message files.
+        message_files = (
+            tuple(provider.event_message_files or ()) +
+            self._DEFAULT_PARAMETER_MESSAGE_FILES)
+
+      message_file_identifiers = self._GetEventMessageFileIdentifiers(
+          message_files)
+      self._parameter_message_file_identifiers[lookup_key] = (
+          message_file_identifiers)
+
+    return message_file_identifiers
+
   def _GetWindowsEventLogProvider(self, provider_identifier, log_source):
     """Retrieves a Windows EventLog provider.
 
@@ -882,53 +1256,48 @@ class WinevtResourcesHelper(object):
       tuple[WindowsEventLogProviderArtifact, str]: Windows EventLog provider
           or None if not available, and provider lookup key.
     """
+    cache_key = (provider_identifier, log_source)
+    cached_value = self._providers_cache.get(cache_key, None)
+    if cached_value:
+      return cached_value
+
     provider = None
 
+    # The lookup keys are case folded, the same as when the providers are read.
     if provider_identifier:
-      lookup_key = provider_identifier.lower()
+      lookup_key = provider_identifier.casefold()
       provider = self._windows_eventlog_providers.get(lookup_key, None)
 
     if not provider:
-      lookup_key = log_source.lower()
+      lookup_key = log_source.casefold()
       provider = self._windows_eventlog_providers.get(lookup_key, None)
 
-    return provider, lookup_key
+    cached_value = (provider, lookup_key)
+    self._providers_cache[cache_key] = cached_value
+
+    return cached_value
 
   def _GetWinevtRcDatabaseReader(self):
-    """Opens the Windows EventLog resource database reader.
+    """Retrieves the Windows EventLog resource database reader.
+
+    The database reader is shared by all helpers in the same process and
+    thread that use the same database.
 
     Returns:
       WinevtResourcesSqlite3DatabaseReader: Windows EventLog resource
           database reader or None.
     """
     if not self._winevt_database_reader and self._data_location:
-      logger.warning((
-          f'Falling back to {self._WINEVT_RC_DATABASE:s}. Please make sure '
-          f'the Windows EventLog message strings in the database correspond '
-          f'to those in the EventLog files.'))
+      database_path = os.path.abspath(os.path.join(
+          self._data_location, self._WINEVT_RC_DATABASE))
+      lookup_key = (os.getpid(), database_path)
 
-      database_path = os.path.join(
-          self._data_location, self._WINEVT_RC_DATABASE)
-      if not os.path.isfile(database_path):
-        return None
+      database_readers = self._GetDatabaseReaders()
+      if lookup_key not in database_readers:
+        database_readers[lookup_key] = self._OpenWinevtRcDatabaseReader(
+            database_path)
 
-      try:
-        self._winevt_database_reader = WinevtResourcesSqlite3DatabaseReader()
-        result = self._winevt_database_reader.Open(database_path)
-      except sqlite3.OperationalError:
-        result = False
-
-      if not result:
-        try:
-          self._winevt_database_reader = (
-              WinevtResourcesAttributeContainerStore())
-          self._winevt_database_reader.Open(path=database_path, read_only=True)  # pylint: disable=no-value-for-parameter,unexpected-keyword-arg
-          result = True
-        except IOError:
-          result = False
-
-      if not result:
-        self._winevt_database_reader = None
+      self._winevt_database_reader = database_readers[lookup_key]
 
     return self._winevt_database_reader
 
@@ -973,8 +1342,8 @@ class WinevtResourcesHelper(object):
     message_identifier = self._GetMappedMessageIdentifier(
         database_reader, provider_identifier, message_identifier, event_version)
 
-    message_file_identifiers = self._GetEventMessageFileIdentifiers(
-        provider.event_message_files)
+    message_file_identifiers = self._GetProviderEventMessageFileIdentifiers(
+        provider)
     if not message_file_identifiers:
       logger.warning((
           f'No event message file for identifier: 0x{message_identifier:08x} '
@@ -992,12 +1361,48 @@ class WinevtResourcesHelper(object):
       return None
 
     message_string = message_strings[0].text
-    if database_reader.string_format == 'wrc':
-      message_string = self._resouce_file_helper.FormatMessageStringInPEP3101(
-          message_string)
+    if database_reader.string_format == 'wrc' and message_string:
+      message_string = _FormatMessageStringInPEP3101(message_string)
 
     return message_string
 
+  def _OpenWinevtRcDatabaseReader(self, database_path):
+    """Opens a Windows EventLog resource database reader.
+
+    Args:
+      database_path (str): path of the Windows EventLog resource database.
+
+    Returns:
+      WinevtResourcesSqlite3DatabaseReader: Windows EventLog resource
+          database reader or None.
+    """
+    logger.warning((
+        f'Falling back to {self._WINEVT_RC_DATABASE:s}. Please make sure '
+        f'the Windows EventLog message strings in the database correspond '
+        f'to those in the EventLog files.'))
+
+    if not os.path.isfile(database_path):
+      return None
+
+    try:
+      database_reader = WinevtResourcesSqlite3DatabaseReader()
+      result = database_reader.Open(database_path)
+    except sqlite3.OperationalError:
+      result = False
+
+    if not result:
+      try:
+        database_reader = WinevtResourcesAttributeContainerStore()
+        database_reader.Open(path=database_path, read_only=True)  # pylint: disable=no-value-for-parameter,unexpected-keyword-arg
+        result = True
+      except IOError:
+        result = False
+
+    if not result:
+      return None
+
+    return database_reader
+
   def _ReadEnvironmentVariables(self, storage_reader):
     """Reads the environment variables.
 
@@ -1005,8 +1410,20 @@ class WinevtResourcesHelper(object):
       storage_reader (StorageReader): storage reader.
     """
     # TODO: get environment variables related to the source.
-    self._environment_variables = list(storage_reader.GetAttributeContainers(
-        'environment_variable'))
+    environment_variables = storage_reader.GetAttributeContainers(
+        'environment_variable')
+
+    # A lookup table is used to expand the environment variables in the paths
+    # of the message files.
+    self._environment_variables = (
+        path_helper.PathHelper.GetEnvironmentVariablesLookupTable(
+            environment_variables))
+
+    # The lookup paths and therefore the message file identifiers depend on
+    # the environment variables.
+    self._event_message_file_identifiers = {}
+    self._lookup_paths_cache = {}
+    self._parameter_message_file_identifiers = {}
 
   def _ReadEventMessageString(
       self, storage_reader, provider_identifier, log_source,
@@ -1047,8 +1464,8 @@ class WinevtResourcesHelper(object):
     message_identifier = self._GetMappedMessageIdentifier(
         storage_reader, provider_identifier, message_identifier, event_version)
 
-    message_file_identifiers = self._GetEventMessageFileIdentifiers(
-        provider.event_message_files)
+    message_file_identifiers = self._GetProviderEventMessageFileIdentifiers(
+        provider)
     if not message_file_identifiers:
       logger.warning((
           f'No event message file for identifier: 0x{message_identifier:08x} '
@@ -1099,15 +1516,8 @@ class WinevtResourcesHelper(object):
         'windows_eventlog_message_string'):
       return None
 
-    message_files = provider.parameter_message_files
-    if not message_files:
-      # If no parameter message files are defined fallback to the event
-      # message files and default parameter message files.
-      message_files = list(provider.event_message_files)
-      message_files.extend(self._DEFAULT_PARAMETER_MESSAGE_FILES)
-
-    message_file_identifiers = self._GetEventMessageFileIdentifiers(
-        message_files)
+    message_file_identifiers = (
+        self._GetProviderParameterMessageFileIdentifiers(provider))
     if not message_file_identifiers:
       logger.warning((
           f'No parameter message file for identifier: '
@@ -1135,18 +1545,20 @@ class WinevtResourcesHelper(object):
       path_attribute (Optional[str]): name of the attribute containing the path.
     """
     # TODO: get windows eventlog message files related to the source.
+    self._event_message_file_identifiers = {}
+    self._parameter_message_file_identifiers = {}
     self._windows_eventlog_message_files = {}
     if attribute_store.HasAttributeContainers(container_type):
-      for message_file in attribute_store.GetAttributeContainers(
-          container_type):
-        message_file_path = getattr(message_file, path_attribute, None)
-        path, filename = path_helper.PathHelper.GetWindowsSystemPath(
-            message_file_path, self._environment_variables)
+      environment_variables = self._environment_variables
+      get_windows_system_path = path_helper.PathHelper.GetWindowsSystemPath
 
-        lookup_path = '\\'.join([path, filename]).lower()
-        message_file_identifier = message_file.GetIdentifier()
-        self._windows_eventlog_message_files[lookup_path] = (
-            message_file_identifier)
+      # The lookup path is the expanded path and filename in lower case.
+      self._windows_eventlog_message_files = {
+          '\\'.join(get_windows_system_path(
+              getattr(message_file, path_attribute, None),
+              environment_variables)).lower(): message_file.GetIdentifier()
+          for message_file in attribute_store.GetAttributeContainers(
+              container_type)}
 
   def _ReadWindowsEventLogProviders(
       self, attribute_store, container_type='windows_eventlog_provider'):
@@ -1156,15 +1568,43 @@ class WinevtResourcesHelper(object):
       attribute_store (AttributeContainerStore): attribute container store.
       container_type (Optional[str]): attribute container type.
     """
+    self._event_message_file_identifiers = {}
+    self._parameter_message_file_identifiers = {}
+    self._providers_cache = {}
     self._windows_eventlog_providers = {}
     if attribute_store.HasAttributeContainers(container_type):
-      for provider in attribute_store.GetAttributeContainers(container_type):
-        if provider.identifier:
-          self._windows_eventlog_providers[provider.identifier] = provider
+      # A provider is stored under its identifier, if set, and its log sources,
+      # where providers read later take precedence.
+      self._windows_eventlog_providers = {
+          lookup_key.casefold(): provider
+          for provider in attribute_store.GetAttributeContainers(
+              container_type)
+          for lookup_key in [provider.identifier, *provider.log_sources]
+          if lookup_key}
+
+  @classmethod
+  def CloseDatabaseReaders(cls):
+    """Closes the shared Windows EventLog resource database readers.
+
+    Only the database readers opened by the current thread are closed, of
+    which readers inherited from a parent process are released instead.
+    Readers that were already closed are ignored.
+    """
+    process_identifier = os.getpid()
 
-        for log_source in provider.log_sources:
-          log_source = log_source.lower()
-          self._windows_eventlog_providers[log_source] = provider
+    database_readers = cls._GetDatabaseReaders()
+    try:
+      for lookup_key, database_reader in database_readers.items():
+        if not database_reader or lookup_key[0] != process_identifier:
+          continue
+
+        try:
+          database_reader.Close()
+        except (IOError, RuntimeError):
+          pass
+
+    finally:
+      database_readers.clear()
 
   def GetMessageString(
       self, provider_identifier, log_source, message_identifier, event_version):
@@ -1179,8 +1619,13 @@ class WinevtResourcesHelper(object):
     Returns:
       str: message string or None if not available.
     """
-    message_string = self._GetCachedMessageString(
+    lookup_key = self._GetMessageStringLookupKey(
         provider_identifier, log_source, message_identifier, event_version)
+
+    message_string = self._GetCachedMessageString(lookup_key)
+    if message_string is self._MESSAGE_STRING_NOT_AVAILABLE:
+      return None
+
     if not message_string:
       if self._storage_reader:
         message_string = self._ReadEventMessageString(
@@ -1190,12 +1635,11 @@ class WinevtResourcesHelper(object):
         message_string = self._GetWinevtRcDatabaseMessageString(
             provider_identifier, log_source, message_identifier, event_version)
 
-      if message_string:
+      if lookup_key:
         self._CacheMessageString(
-            provider_identifier, log_source, message_identifier, event_version,
-            message_string)
+            lookup_key, message_string or self._MESSAGE_STRING_NOT_AVAILABLE)
 
-    return message_string
+    return message_string or None
 
   def GetParameterString(
       self, provider_identifier, log_source, message_identifier):
@@ -1209,16 +1653,27 @@ class WinevtResourcesHelper(object):
     Returns:
       str: parameter string or None if not available.
     """
-    message_string = self._GetCachedMessageString(
+    lookup_key = self._GetMessageStringLookupKey(
         provider_identifier, log_source, message_identifier, None)
+    if lookup_key:
+      # Parameter strings are stored in different message files than message
+      # strings and therefore need a distinct lookup key.
+      lookup_key = ('parameter', lookup_key)
+
+    message_string = self._GetCachedMessageString(lookup_key)
+    if message_string is self._MESSAGE_STRING_NOT_AVAILABLE:
+      return None
+
     if not message_string:
       message_string = self._ReadParameterMessageString(
           self._storage_reader, provider_identifier, log_source,
           message_identifier)
 
-      if message_string:
+      if lookup_key:
         self._CacheMessageString(
-            provider_identifier, log_source, message_identifier,
-            None, message_string)
+            lookup_key, message_string or self._MESSAGE_STRING_NOT_AVAILABLE)
 
-    return message_string
+    return message_string or None
+
+
+atexit.register(WinevtResourcesHelper.CloseDatabaseReaders)
@@ -1,6 +1,9 @@
 # -*- coding: utf-8 -*-
 """Text parser plugin for Windows Firewall Log files."""
 
+import functools
+import re
+
 import pyparsing
 
 from dfdatetime import time_elements as dfdatetime_time_elements
@@ -67,113 +70,155 @@ class WinFirewallLogTextPlugin(interface.TextPlugin):
   # A Windows Firewall is encoded using the system codepage.
   ENCODING = None
 
-  _TWO_DIGITS = pyparsing.Word(pyparsing.nums, exact=2).set_parse_action(
-      lambda tokens: int(tokens[0], 10))
-
-  _FOUR_DIGITS = pyparsing.Word(pyparsing.nums, exact=4).set_parse_action(
-      lambda tokens: int(tokens[0], 10))
-
-  _DATE = pyparsing.Group(
-      _FOUR_DIGITS + pyparsing.Suppress('-') +
-      _TWO_DIGITS + pyparsing.Suppress('-') + _TWO_DIGITS)
+  # Header lines are comment lines, of which the fields and time format
+  # metadata are stored.
+  _COMMENT_LOG_LINE = (
+      pyparsing.Regex(r'#Fields: (?P<fields>.*)(?:\n|$)') |
+      pyparsing.Regex(r'#Time Format: (?P<time_format>.*)(?:\n|$)') |
+      pyparsing.Regex(r'#.*(?:\n|$)'))
+
+  # Log lines are parsed with a single regular expression, where values are
+  # separated by whitespace and the values of fields that are not set are
+  # represented by "-".
+
+  _ACTION = r'[0-9A-Za-z-]{2,}'
+
+  _INTEGER = r'[0-9]+'
+
+  _IP_ADDRESS = (
+      pyparsing.pyparsing_common.ipv4_address.pattern + '|'
+      r'[0-9A-Fa-f]{0,4}(?::[0-9A-Fa-f]{0,4}){1,7}'
+      r'(?::[0-9]{1,3}(?:\.[0-9]{1,3}){3})?')
+
+  _PORT_NUMBER = r'[0-9]{1,6}'
+
+  _WORD = r'[0-9A-Za-z]+'
+
+  _FIELD_SEPARATOR = r'[ \t\r]+'
+
+  _LINE_END = r'[ \t\r]*(?:\n|$)'
+
+  # Regular expression per field. Set group names with underscores, not
+  # hyphens, because regular expressions do not support them.
+
+  _LOG_LINE_FIELDS = {
+      'action': r'(?P<action>' + _ACTION + r')',
+      'date': (
+          r'(?P<year>[0-9]{4})-(?P<month>[0-9]{2})-'
+          r'(?P<day_of_month>[0-9]{2})'),
+      'dst-ip': r'(?:(?P<destination_ip>' + _IP_ADDRESS + r')|-)',
+      'dst-port': r'(?:(?P<destination_port>' + _PORT_NUMBER + r')|-)',
+      'icmpcode': r'(?:(?P<icmp_code>' + _INTEGER + r')|-)',
+      'icmptype': r'(?:(?P<icmp_type>' + _INTEGER + r')|-)',
+      'info': r'(?:(?P<information>' + _WORD + r')|-)',
+      'path': r'(?:(?P<path>' + _WORD + r')|-)',
+      'protocol': r'(?:(?P<protocol>' + _WORD + r')|-)',
+      'size': r'(?:(?P<packet_size>' + _INTEGER + r')|-)',
+      'src-ip': r'(?:(?P<source_ip>' + _IP_ADDRESS + r')|-)',
+      'src-port': r'(?:(?P<source_port>' + _PORT_NUMBER + r')|-)',
+      'tcpack': r'(?:(?P<tcp_ack>' + _INTEGER + r')|-)',
+      'tcpflags': r'(?:(?P<tcp_flags>' + _WORD + r')|-)',
+      'tcpsyn': r'(?:(?P<tcp_sequence_number>' + _INTEGER + r')|-)',
+      'tcpwin': r'(?:(?P<tcp_window_size>' + _INTEGER + r')|-)',
+      'time': (
+          r'(?P<hours>[0-9]{2}):(?P<minutes>[0-9]{2}):'
+          r'(?P<seconds>[0-9]{2})')}
+
+  # Names of the values of a log line that are integers.
+  _INTEGER_VALUE_NAMES = (
+      'destination_port', 'icmp_code', 'icmp_type', 'packet_size',
+      'source_port', 'tcp_ack', 'tcp_sequence_number', 'tcp_window_size')
+
+  # Regular expression of a field without a definition.
+  _UNKNOWN_FIELD = r'(?:' + _WORD + r'|-)'
+
+  # Regular expression to replace named groups with non-capturing groups.
+  _NAMED_GROUP_RE = re.compile(r'\(\?P<[a-z_]+>')
 
-  _TIME = pyparsing.Group(
-      _TWO_DIGITS + pyparsing.Suppress(':') +
-      _TWO_DIGITS + pyparsing.Suppress(':') + _TWO_DIGITS)
+  # Version 1.5 fields:
+  # date time action protocol src-ip dst-ip src-port dst-port size tcpflags
+  # tcpsyn tcpack tcpwin icmptype icmpcode info path
 
-  _ACTION = pyparsing.Word(pyparsing.alphanums + '-', min=2)
+  _LOG_LINE_1_5 = pyparsing.Regex(_FIELD_SEPARATOR.join([
+      _LOG_LINE_FIELDS['date'],
+      _LOG_LINE_FIELDS['time'],
+      _LOG_LINE_FIELDS['action'],
+      _LOG_LINE_FIELDS['protocol'],
+      _LOG_LINE_FIELDS['src-ip'],
+      _LOG_LINE_FIELDS['dst-ip'],
+      _LOG_LINE_FIELDS['src-port'],
+      _LOG_LINE_FIELDS['dst-port'],
+      _LOG_LINE_FIELDS['size'],
+      _LOG_LINE_FIELDS['tcpflags'],
+      _LOG_LINE_FIELDS['tcpsyn'],
+      _LOG_LINE_FIELDS['tcpack'],
+      _LOG_LINE_FIELDS['tcpwin'],
+      _LOG_LINE_FIELDS['icmptype'],
+      _LOG_LINE_FIELDS['icmpcode'],
+      _LOG_LINE_FIELDS['info'],
+      _LOG_LINE_FIELDS['path']]) + _LINE_END)
 
-  _WORD_OR_BLANK = (
-      pyparsing.Word(pyparsing.alphanums) | pyparsing.Suppress('-'))
+  _HEADER_GRAMMAR = pyparsing.OneOrMore(_COMMENT_LOG_LINE)
 
-  _IP_ADDRESS_OR_BLANK = (
-      pyparsing.pyparsing_common.ipv4_address |
-      pyparsing.pyparsing_common.ipv6_address | pyparsing.Suppress('-'))
+  _LINE_STRUCTURES = [('log_line', _LOG_LINE_1_5)]
 
-  _PORT_NUMBER_OR_BLANK = (
-      pyparsing.Word(pyparsing.nums, max=6).set_parse_action(
-          lambda tokens: int(tokens[0], 10)) | pyparsing.Suppress('-'))
+  VERIFICATION_GRAMMAR = pyparsing.Regex(
+      r'(?:#(?:Fields|Time Format|Version): .*\n)*'
+      r'#Software: Microsoft Windows Firewall' + _LINE_END)
 
-  _INTEGER_OR_BLANK = (
-      pyparsing.Word(pyparsing.nums).set_parse_action(
-          lambda tokens: int(tokens[0], 10)) | pyparsing.Suppress('-'))
+  VERIFICATION_LITERALS = ['#Software: Microsoft Windows Firewall ']
 
-  _END_OF_LINE = pyparsing.Suppress(pyparsing.LineEnd())
+  # Maximum number of characters of the header lines that precede the
+  # software header line.
+  _MAXIMUM_HEADER_SIZE = 4096
 
-  _FIELDS_METADATA = (
-      pyparsing.Suppress('Fields: ') +
-      pyparsing.restOfLine().set_results_name('fields'))
+  def __init__(self):
+    """Initializes a text parser plugin."""
+    super(WinFirewallLogTextPlugin, self).__init__()
+    self._last_date_time = None
+    self._last_time_elements_tuple = None
+    self._use_local_time = False
 
-  _TIME_FORMAT_METADATA = (
-      pyparsing.Suppress('Time Format: ') +
-      pyparsing.restOfLine().set_results_name('time_format'))
+  @classmethod
+  @functools.lru_cache(maxsize=16)
+  def _GetLogLineStructure(cls, fields):
+    """Retrieves the log line structure for specific fields metadata.
 
-  _METADATA = (
-      _FIELDS_METADATA | _TIME_FORMAT_METADATA | pyparsing.restOfLine())
+    The log line structures are cached since there are typically only a few
+    distinct fields metadata, for example in a set of rotated log files.
 
-  _COMMENT_LOG_LINE = pyparsing.Suppress('#') + _METADATA + _END_OF_LINE
+    Args:
+      fields (str): field definitions.
 
-  # Version 1.5 fields:
-  # date time action protocol src-ip dst-ip src-port dst-port size tcpflags
-  # tcpsyn tcpack tcpwin icmptype icmpcode info path
+    Returns:
+      tuple[pyparsing.Regex, tuple[str]]: log line structure and names of
+          fields without a definition.
+    """
+    members = [member for member in fields.split(' ') if member]
 
-  _LOG_LINE_1_5 = (
-      _DATE.set_results_name('date') +
-      _TIME.set_results_name('time') +
-      _ACTION.set_results_name('action') +
-      _WORD_OR_BLANK.set_results_name('protocol') +
-      _IP_ADDRESS_OR_BLANK.set_results_name('source_ip') +
-      _IP_ADDRESS_OR_BLANK.set_results_name('destination_ip') +
-      _PORT_NUMBER_OR_BLANK.set_results_name('source_port') +
-      _PORT_NUMBER_OR_BLANK.set_results_name('destination_port') +
-      _INTEGER_OR_BLANK.set_results_name('packet_size') +
-      _WORD_OR_BLANK.set_results_name('tcp_flags') +
-      _INTEGER_OR_BLANK.set_results_name('tcp_sequence_number') +
-      _INTEGER_OR_BLANK.set_results_name('tcp_ack') +
-      _INTEGER_OR_BLANK.set_results_name('tcp_window_size') +
-      _INTEGER_OR_BLANK.set_results_name('icmp_type') +
-      _INTEGER_OR_BLANK.set_results_name('icmp_code') +
-      _WORD_OR_BLANK.set_results_name('information') +
-      _WORD_OR_BLANK.set_results_name('path') +
-      _END_OF_LINE)
-
-  # Common fields. Set results name with underscores, not hyphens because regex
-  # will not pick them up.
-
-  _LOG_LINE_STRUCTURES = {
-      'action': _ACTION.set_results_name('action'),
-      'date': _DATE.set_results_name('date'),
-      'dst-ip': _IP_ADDRESS_OR_BLANK.set_results_name('destination_ip'),
-      'dst-port': _PORT_NUMBER_OR_BLANK.set_results_name('destination_port'),
-      'icmpcode': _INTEGER_OR_BLANK.set_results_name('icmp_code'),
-      'icmptype': _INTEGER_OR_BLANK.set_results_name('icmp_type'),
-      'info': _WORD_OR_BLANK.set_results_name('information'),
-      'path': _WORD_OR_BLANK.set_results_name('path'),
-      'protocol': _WORD_OR_BLANK.set_results_name('protocol'),
-      'size': _INTEGER_OR_BLANK.set_results_name('packet_size'),
-      'src-ip': _IP_ADDRESS_OR_BLANK.set_results_name('source_ip'),
-      'src-port': _PORT_NUMBER_OR_BLANK.set_results_name('source_port'),
-      'tcpack': _INTEGER_OR_BLANK.set_results_name('tcp_ack'),
-      'tcpflags': _WORD_OR_BLANK.set_results_name('tcp_flags'),
-      'tcpsyn': _INTEGER_OR_BLANK.set_results_name('tcp_sequence_number'),
-      'tcpwin': _INTEGER_OR_BLANK.set_results_name('tcp_window_size'),
-      'time': _TIME.set_results_name('time')}
+    # A regular expression can only define a group name once, hence only
+    # the value of the last occurrence of a field is stored, as it would
+    # overwrite the values of preceding occurrences.
+    last_member_indexes = {
+        member: member_index for member_index, member in enumerate(members)}
 
-  _HEADER_GRAMMAR = pyparsing.OneOrMore(_COMMENT_LOG_LINE)
+    field_expressions = []
+    undefined_fields = []
+    for member_index, member in enumerate(members):
+      field_expression = cls._LOG_LINE_FIELDS.get(member, None)
+      if not field_expression:
+        undefined_fields.append(member)
+        field_expression = cls._UNKNOWN_FIELD
 
-  _LINE_STRUCTURES = [('log_line', _LOG_LINE_1_5)]
+      elif member_index != last_member_indexes[member]:
+        field_expression = cls._NAMED_GROUP_RE.sub('(?:', field_expression)
 
-  VERIFICATION_GRAMMAR = (
-      pyparsing.ZeroOrMore(
-          pyparsing.Regex('#(Fields|Time Format|Version): .*') + _END_OF_LINE) +
-      pyparsing.Regex('#Software: Microsoft Windows Firewall') + _END_OF_LINE)
+      field_expressions.append(field_expression)
 
-  VERIFICATION_LITERALS = ['#Software: Microsoft Windows Firewall ']
+    log_line_structure = pyparsing.Regex(
+        cls._FIELD_SEPARATOR.join(field_expressions) + cls._LINE_END)
 
-  def __init__(self):
-    """Initializes a text parser plugin."""
-    super(WinFirewallLogTextPlugin, self).__init__()
-    self._use_local_time = False
+    return log_line_structure, tuple(undefined_fields)
 
   def _ParseFieldsMetadata(self, parser_mediator, fields):
     """Parses the fields metadata and updates the log line definition to match.
@@ -183,21 +228,12 @@ class WinFirewallLogTextPlugin(interface.TextPlugin):
           and other components, such as storage and dfVFS.
       fields (str): field definitions.
     """
-    log_line_structure = pyparsing.Empty()
-    for member in fields.split(' '):
-      if not member:
-        continue
-
-      field_structure = self._LOG_LINE_STRUCTURES.get(member, None)
-      if not field_structure:
-        field_structure = self._WORD_OR_BLANK
-        parser_mediator.ProduceExtractionWarning((
-            'missing definition for field: {0:s} defaulting to '
-            'WORD_OR_BLANK').format(member))
-
-      log_line_structure += field_structure
+    log_line_structure, undefined_fields = self._GetLogLineStructure(fields)
 
-    log_line_structure += self._END_OF_LINE
+    for member in undefined_fields:
+      parser_mediator.ProduceExtractionWarning((
+          'missing definition for field: {0:s} defaulting to '
+          'WORD_OR_BLANK').format(member))
 
     self._SetLineStructures([('log_line', log_line_structure)])
 
@@ -245,30 +281,24 @@ class WinFirewallLogTextPlugin(interface.TextPlugin):
           and other components, such as storage and dfVFS.
       structure (pyparsing.ParseResults): tokens from a parsed log line.
     """
+    # The structure of a log line contains string values or None, hence
+    # its values are retrieved directly.
+    get = structure.get
+
     event_data = WinFirewallEventData()
-    event_data.action = self._GetValueFromStructure(structure, 'action')
-    event_data.destination_ip = self._GetValueFromStructure(
-        structure, 'destination_ip')
-    event_data.destination_port = self._GetValueFromStructure(
-        structure, 'destination_port')
-    event_data.icmp_code = self._GetValueFromStructure(structure, 'icmp_code')
-    event_data.icmp_type = self._GetValueFromStructure(structure, 'icmp_type')
-    event_data.information = self._GetValueFromStructure(
-        structure, 'information')
+    event_data.action = get('action')
+    event_data.destination_ip = get('destination_ip')
+    event_data.information = get('information')
     event_data.last_written_time = self._ParseTimeElements(structure)
-    event_data.path = self._GetValueFromStructure(structure, 'path')
-    event_data.protocol = self._GetValueFromStructure(structure, 'protocol')
-    event_data.packet_size = self._GetValueFromStructure(
-        structure, 'packet_size')
-    event_data.source_ip = self._GetValueFromStructure(structure, 'source_ip')
-    event_data.source_port = self._GetValueFromStructure(
-        structure, 'source_port')
-    event_data.tcp_ack = self._GetValueFromStructure(structure, 'tcp_ack')
-    event_data.tcp_flags = self._GetValueFromStructure(structure, 'tcp_flags')
-    event_data.tcp_sequence_number = self._GetValueFromStructure(
-        structure, 'tcp_sequence_number')
-    event_data.tcp_window_size = self._GetValueFromStructure(
-        structure, 'tcp_window_size')
+    event_data.path = get('path')
+    event_data.protocol = get('protocol')
+    event_data.source_ip = get('source_ip')
+    event_data.tcp_flags = get('tcp_flags')
+
+    for name in self._INTEGER_VALUE_NAMES:
+      value = get(name)
+      if value is not None:
+        setattr(event_data, name, int(value, 10))
 
     parser_mediator.ProduceEventData(event_data)
 
@@ -299,19 +329,32 @@ class WinFirewallLogTextPlugin(interface.TextPlugin):
       ParseError: if a valid date and time value cannot be derived from
           the time elements.
     """
+    get = structure.get
+
     try:
-      date_elements_structure = self._GetValueFromStructure(structure, 'date')
-      time_elements_structure = self._GetValueFromStructure(structure, 'time')
+      time_elements_tuple = (
+          int(get('year'), 10), int(get('month'), 10),
+          int(get('day_of_month'), 10), int(get('hours'), 10),
+          int(get('minutes'), 10), int(get('seconds'), 10))
 
-      year, month, day_of_month = date_elements_structure
-      hours, minutes, seconds = time_elements_structure
+    except TypeError as exception:
+      raise errors.ParseError(
+          'Unable to parse time elements with error: {0!s}'.format(exception))
 
-      time_elements_tuple = (year, month, day_of_month, hours, minutes, seconds)
+    # Consecutive log lines often have the same date and time, in which case
+    # the date and time value of the previous log line is reused.
+    if (time_elements_tuple == self._last_time_elements_tuple and
+        self._last_date_time.is_local_time == self._use_local_time):
+      return self._last_date_time
 
+    try:
       date_time = dfdatetime_time_elements.TimeElements(
           time_elements_tuple=time_elements_tuple)
       date_time.is_local_time = self._use_local_time
 
+      self._last_date_time = date_time
+      self._last_time_elements_tuple = time_elements_tuple
+
       return date_time
 
     except (TypeError, ValueError) as exception:
@@ -320,6 +363,8 @@ class WinFirewallLogTextPlugin(interface.TextPlugin):
 
   def _ResetState(self):
     """Resets stored values."""
+    self._last_date_time = None
+    self._last_time_elements_tuple = None
     self._use_local_time = False
 
     self._SetLineStructures(self._LINE_STRUCTURES)
@@ -335,6 +380,13 @@ class WinFirewallLogTextPlugin(interface.TextPlugin):
     Returns:
       bool: True if this is the correct plugin, False otherwise.
     """
+    # Fail fast without the verification grammar if the text does not start
+    # with a comment line or does not contain the software header line.
+    header_lines = text_reader.lines[:self._MAXIMUM_HEADER_SIZE]
+    if (header_lines[:1] != '#' or
+        '#Software: Microsoft Windows Firewall' not in header_lines):
+      return False
+
     try:
       self._VerifyString(text_reader.lines)
     except errors.ParseError:
@@ -271,6 +271,13 @@ class PathHelperTest(shared_test_lib.BaseTestCase):
         ['%%environ_systemroot%%', 'System32'], environment_variables)
     self.assertEqual(expanded_path_segment, ['', 'Windows', 'System32'])
 
+    lookup_table = path_helper.PathHelper.GetEnvironmentVariablesLookupTable(
+        environment_variables)
+
+    expanded_path_segment = path_helper.PathHelper.ExpandWindowsPathSegments(
+        ['%SystemRoot%', 'System32'], lookup_table)
+    self.assertEqual(expanded_path_segment, ['', 'Windows', 'System32'])
+
     # Test non-string environment variable.
     environment_variables = []
 
@@ -386,6 +393,26 @@ class PathHelperTest(shared_test_lib.BaseTestCase):
         dfvfs_definitions.TYPE_INDICATOR_QCOW, parent=os_path_spec)
     self.assertIsNone(display_name)
 
+  def testGetEnvironmentVariablesLookupTable(self):
+    """Tests the GetEnvironmentVariablesLookupTable function."""
+    environment_variables = []
+
+    environment_variable = artifacts.EnvironmentVariableArtifact(
+        case_sensitive=False, name='SystemRoot', value='C:\\Windows')
+    environment_variables.append(environment_variable)
+
+    environment_variable = artifacts.EnvironmentVariableArtifact(
+        case_sensitive=False, name='bogus', value=('bogus', 0))
+    environment_variables.append(environment_variable)
+
+    lookup_table = path_helper.PathHelper.GetEnvironmentVariablesLookupTable(
+        environment_variables)
+    self.assertEqual(lookup_table, {'SYSTEMROOT': 'C:\\Windows'})
+
+    lookup_table = path_helper.PathHelper.GetEnvironmentVariablesLookupTable(
+        None)
+    self.assertEqual(lookup_table, {})
+
   def testGetRelativePathForPathSpec(self):
     """Tests the GetRelativePathForPathSpec function."""
     test_path = self._GetTestFilePath(['syslog.gz'])
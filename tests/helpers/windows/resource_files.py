@@ -27,6 +27,10 @@ class WindowsResourceFileHelperTest(shared_test_lib.BaseTestCase):
         'deleted.\\n{9:s}\\\\nSee details for more information.')
     self.assertEqual(message_string, expected_message_string)
 
+    message_string = test_helper.FormatMessageStringInPEP3101(
+        'The system has resumed.\0')
+    self.assertEqual(message_string, 'The system has resumed.')
+
 
 if __name__ == '__main__':
   unittest.main()
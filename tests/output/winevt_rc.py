@@ -2,17 +2,206 @@
 # -*- coding: utf-8 -*-
 """Tests for the Windows Event Log resources database reader."""
 
+import os
+import shutil
 import sqlite3
+import tempfile
+import threading
 import unittest
 
+from unittest import mock
+
 from plaso.output import winevt_rc
 
 from tests import test_lib as shared_test_lib
 
 
-class WinevtResourcesSqlite3DatabaseReaderTest(shared_test_lib.BaseTestCase):
+class WinevtResourcesTestDatabaseTestCase(shared_test_lib.BaseTestCase):
+  """Windows EventLog resources test database test case."""
+
+  # Message strings per message identifier per message table, where the
+  # message table is identified by message file key and LCID.
+  _MESSAGE_TABLES = {
+      (1, 0x00000409): [
+          (0x00000001, 'Test %1'),
+          (0x00000002, ''),
+          (0x00000003, 'First'),
+          (0x00000003, 'Second')],
+      (1, 0x00000413): [
+          (0x00000001, 'Test %1 (nl-NL)')],
+      (2, 0x00000409): [
+          (0x00000004, 'Other %1 %2'),
+          (0x00000005, '')]}
+
+  def _CreateTestDatabase(self, path, message_identifier_type='TEXT'):
+    """Creates a test Windows EventLog resources database.
+
+    Args:
+      path (str): path of the database.
+      message_identifier_type (Optional[str]): declared type of the message
+          identifier column, where identifiers of a column of which the type
+          does not contain "INT" are stored as strings, such as "0x00000001".
+    """
+    is_integer = 'INT' in message_identifier_type.upper()
+
+    connection = sqlite3.connect(path)
+
+    try:
+      connection.executescript((
+          'CREATE TABLE metadata (name TEXT, value TEXT);'
+          'CREATE TABLE event_log_providers ('
+          'event_log_provider_key INTEGER, log_source TEXT);'
+          'CREATE TABLE message_file_per_event_log_provider ('
+          'message_file_key INTEGER, event_log_provider_key INTEGER);'))
+
+      connection.execute(
+          'INSERT INTO metadata VALUES (?, ?)', ('version', '20150315'))
+
+      connection.executemany(
+          'INSERT INTO event_log_providers VALUES (?, ?)', [
+              (1, 'Test'), (2, 'Ambiguous'), (3, 'Ambiguous')])
+
+      connection.executemany(
+          'INSERT INTO message_file_per_event_log_provider VALUES (?, ?)', [
+              (1, 1), (2, 1), (1, 2)])
+
+      for (message_file_key, lcid), messages in self._MESSAGE_TABLES.items():
+        table_name = f'message_table_{message_file_key:d}_0x{lcid:08x}'
+        connection.execute((
+            f'CREATE TABLE {table_name:s} ('
+            f'message_identifier {message_identifier_type:s}, '
+            f'message_string TEXT)'))
+
+        for message_identifier, message_string in messages:
+          if not is_integer:
+            message_identifier = f'0x{message_identifier:08x}'
+
+          connection.execute(
+              f'INSERT INTO {table_name:s} VALUES (?, ?)',
+              (message_identifier, message_string))
+
+      connection.commit()
+
+    finally:
+      connection.close()
+
+  def setUp(self):
+    """Makes preparations before running an individual test."""
+    # The directory name contains characters that need to be escaped in
+    # a database URI.
+    self._temp_directory = tempfile.mkdtemp(prefix='winevt rc%')
+    self._database_path = os.path.join(self._temp_directory, 'winevt-rc.db')
+    self._CreateTestDatabase(self._database_path)
+
+  def tearDown(self):
+    """Cleans up after running an individual test."""
+    shutil.rmtree(self._temp_directory, True)
+
+
+class Sqlite3DatabaseFileTest(WinevtResourcesTestDatabaseTestCase):
+  """Tests for the sqlite3 database file."""
+
+  # pylint: disable=protected-access
+
+  def testGetColumnTypes(self):
+    """Tests the GetColumnTypes function."""
+    database_file = winevt_rc.Sqlite3DatabaseFile()
+
+    database_file.Open(self._database_path, read_only=True)
+
+    try:
+      column_types = database_file.GetColumnTypes('metadata')
+      self.assertEqual(column_types, {'name': 'TEXT', 'value': 'TEXT'})
+
+    finally:
+      database_file.Close()
+
+  def testGetSingleValue(self):
+    """Tests the GetSingleValue function."""
+    database_file = winevt_rc.Sqlite3DatabaseFile()
+
+    database_file.Open(self._database_path, read_only=True)
+
+    try:
+      values = database_file.GetSingleValue(
+          'metadata', ['value'], 'name == ?', parameters=('version', ))
+      self.assertIsNotNone(values)
+      self.assertEqual(values['value'], '20150315')
+
+      values = database_file.GetSingleValue(
+          'metadata', ['value'], 'name == ?', parameters=('bogus', ))
+      self.assertIsNone(values)
+
+      with self.assertRaises(RuntimeError):
+        database_file.GetSingleValue(
+            'event_log_providers', ['log_source'], None)
+
+      with self.assertRaises(RuntimeError):
+        database_file.GetSingleValue(
+            'metadata', ['bogus'], 'name == ?', parameters=('version', ))
+
+    finally:
+      database_file.Close()
+
+  def testGetValues(self):
+    """Tests the GetValues function."""
+    database_file = winevt_rc.Sqlite3DatabaseFile()
+
+    database_file.Open(self._database_path, read_only=True)
+
+    try:
+      generator = database_file.GetValues(
+          ['event_log_providers'], ['event_log_provider_key', 'log_source'],
+          None)
+      values = next(generator)
+      self.assertIsNotNone(values)
+
+      # Abandoning the generator should not affect subsequent queries.
+      generator.close()
+
+      values = database_file.GetSingleValue(
+          'metadata', ['value'], 'name == ?', parameters=('version', ))
+      self.assertIsNotNone(values)
+      self.assertEqual(values['value'], '20150315')
+
+      values = list(database_file.GetValues(
+          ['event_log_providers'], ['event_log_provider_key'],
+          'log_source == ?', parameters=('Ambiguous', )))
+      self.assertEqual(len(values), 2)
+
+      # SQLite treats a double-quoted unknown column name as a string literal.
+      with self.assertRaises(RuntimeError):
+        list(database_file.GetValues(['metadata'], ['bogus'], None))
+
+    finally:
+      database_file.Close()
+
+  def testOpen(self):
+    """Tests the Open function."""
+    database_file = winevt_rc.Sqlite3DatabaseFile()
+
+    result = database_file.Open(self._database_path, read_only=True)
+    self.assertTrue(result)
+
+    try:
+      # The database is opened read-only.
+      with self.assertRaises(sqlite3.OperationalError):
+        database_file._connection.execute(
+            'INSERT INTO metadata VALUES (?, ?)', ('bogus', 'bogus'))
+
+      with self.assertRaises(RuntimeError):
+        database_file.Open(self._database_path, read_only=True)
+
+    finally:
+      database_file.Close()
+
+
+class WinevtResourcesSqlite3DatabaseReaderTest(
+    WinevtResourcesTestDatabaseTestCase):
   """Windows EventLog resources SQLite database reader."""
 
+  # pylint: disable=protected-access
+
   def testGetMetadataAttribute(self):
     """Tests the GetMetadataAttribute function."""
     database_path = self._GetTestFilePath(['winevt-rc-v20150315.db'])
@@ -52,6 +241,115 @@ class WinevtResourcesSqlite3DatabaseReaderTest(shared_test_lib.BaseTestCase):
     finally:
       database_reader.Close()
 
+  def testGetMessageWithTestDatabase(self):
+    """Tests the GetMessage function with the test database."""
+    database_reader = winevt_rc.WinevtResourcesSqlite3DatabaseReader()
+
+    database_reader.Open(self._database_path)
+
+    try:
+      message_string = database_reader.GetMessage(
+          'Test', 0x00000409, 0x00000001)
+      self.assertEqual(message_string, 'Test {0:s}')
+
+      message_string = database_reader.GetMessage(
+          'Test', 0x00000413, 0x00000001)
+      self.assertEqual(message_string, 'Test {0:s} (nl-NL)')
+
+      # An empty message string is considered not available.
+      message_string = database_reader.GetMessage(
+          'Test', 0x00000409, 0x00000002)
+      self.assertIsNone(message_string)
+
+      message_string = database_reader.GetMessage(
+          'Test', 0x00000409, 0x00000005)
+      self.assertIsNone(message_string)
+
+      message_string = database_reader.GetMessage(
+          'Test', 0x00000409, 0xffffffff)
+      self.assertIsNone(message_string)
+
+      message_string = database_reader.GetMessage(
+          'Bogus', 0x00000409, 0x00000001)
+      self.assertIsNone(message_string)
+
+      # The message file that contains the message is remembered.
+      message_string = database_reader.GetMessage(
+          'Test', 0x00000409, 0x00000004)
+      self.assertEqual(message_string, 'Other {0:s} {1:s}')
+
+      matching_message_file_key = database_reader._matching_message_file_keys[
+          (1, 0x00000409, 0x00000004)]
+      self.assertEqual(matching_message_file_key, 2)
+
+      message_string = database_reader.GetMessage(
+          'Test', 0x00000409, 0x00000004)
+      self.assertEqual(message_string, 'Other {0:s} {1:s}')
+
+      with self.assertRaises(RuntimeError):
+        database_reader.GetMessage('Test', 0x00000409, 0x00000003)
+
+      with self.assertRaises(RuntimeError):
+        database_reader.GetMessage('Ambiguous', 0x00000409, 0x00000001)
+
+    finally:
+      database_reader.Close()
+
+  def testGetMessageWithIntegerMessageIdentifier(self):
+    """Tests the GetMessage function with integer message identifiers."""
+    database_path = os.path.join(self._temp_directory, 'winevt-rc-int.db')
+    self._CreateTestDatabase(database_path, message_identifier_type='BIGINT')
+
+    database_reader = winevt_rc.WinevtResourcesSqlite3DatabaseReader()
+
+    database_reader.Open(database_path)
+
+    try:
+      message_string = database_reader.GetMessage(
+          'Test', 0x00000409, 0x00000001)
+      self.assertEqual(message_string, 'Test {0:s}')
+
+      self.assertTrue(database_reader._message_identifier_is_integer)
+
+      # An empty message string is considered not available.
+      message_string = database_reader.GetMessage(
+          'Test', 0x00000409, 0x00000002)
+      self.assertIsNone(message_string)
+
+    finally:
+      database_reader.Close()
+
+  def testGetMessageCachedMessageTables(self):
+    """Tests that GetMessage only caches a limited number of message tables."""
+    database_reader = winevt_rc.WinevtResourcesSqlite3DatabaseReader()
+
+    database_reader.Open(self._database_path)
+
+    try:
+      with mock.patch.object(
+          winevt_rc.WinevtResourcesSqlite3DatabaseReader,
+          '_MAXIMUM_CACHED_MESSAGE_TABLES', 1):
+        message_string = database_reader.GetMessage(
+            'Test', 0x00000409, 0x00000001)
+        self.assertEqual(message_string, 'Test {0:s}')
+        self.assertEqual(
+            list(database_reader._message_tables.keys()), [(1, 0x00000409)])
+
+        message_string = database_reader.GetMessage(
+            'Test', 0x00000413, 0x00000001)
+        self.assertEqual(message_string, 'Test {0:s} (nl-NL)')
+        self.assertEqual(
+            list(database_reader._message_tables.keys()), [(1, 0x00000413)])
+
+        message_string = database_reader.GetMessage(
+            'Test', 0x00000409, 0x00000001)
+        self.assertEqual(message_string, 'Test {0:s}')
+        self.assertEqual(
+            list(database_reader._message_tables.keys()), [(1, 0x00000409)])
+
+    finally:
+      database_reader.Close()
+
   def testOpen(self):
     """Tests the Open function."""
     database_path = self._GetTestFilePath(['winevt-rc.db'])
@@ -72,11 +370,145 @@ class WinevtResourcesSqlite3DatabaseReaderTest(shared_test_lib.BaseTestCase):
     database_reader.Close()
 
 
-class WinevtResourcesHelperTest(shared_test_lib.BaseTestCase):
+class WinevtResourcesHelperTest(WinevtResourcesTestDatabaseTestCase):
   """Tests for the Windows EventLog resources helper."""
 
   # pylint: disable=protected-access
 
+  def setUp(self):
+    """Makes preparations before running an individual test."""
+    super(WinevtResourcesHelperTest, self).setUp()
+    self.addCleanup(winevt_rc.WinevtResourcesHelper.CloseDatabaseReaders)
+
+  def testCacheMessageString(self):
+    """Tests the _CacheMessageString and _GetCachedMessageString functions."""
+    test_helper = winevt_rc.WinevtResourcesHelper(None, None, 0x00000409)
+
+    with mock.patch.object(
+        winevt_rc.WinevtResourcesHelper, '_MAXIMUM_CACHED_MESSAGE_STRINGS', 2):
+      test_helper._CacheMessageString('key1', 'message1')
+      test_helper._CacheMessageString('key2', 'message2')
+
+      message_string = test_helper._GetCachedMessageString('key1')
+      self.assertEqual(message_string, 'message1')
+
+      # Caching a third message string evicts the first cached one.
+      test_helper._CacheMessageString('key3', 'message3')
+      self.assertEqual(len(test_helper._message_string_cache), 2)
+
+      message_string = test_helper._GetCachedMessageString('key1')
+      self.assertIsNone(message_string)
+
+      message_string = test_helper._GetCachedMessageString('key2')
+      self.assertEqual(message_string, 'message2')
+
+  def testCloseDatabaseReaders(self):
+    """Tests the CloseDatabaseReaders function."""
+    test_helper = winevt_rc.WinevtResourcesHelper(
+        None, self._temp_directory, 0x00000409)
+
+    database_reader = test_helper._GetWinevtRcDatabaseReader()
+    self.assertIsNotNone(database_reader)
+
+    winevt_rc.WinevtResourcesHelper.CloseDatabaseReaders()
+    winevt_rc.WinevtResourcesHelper.CloseDatabaseReaders()
+
+    test_helper = winevt_rc.WinevtResourcesHelper(
+        None, self._temp_directory, 0x00000409)
+
+    database_reader2 = test_helper._GetWinevtRcDatabaseReader()
+    self.assertIsNotNone(database_reader2)
+    self.assertIsNot(database_reader2, database_reader)
+
+    # Database readers that were already closed are ignored.
+    database_reader2.Close()
+
+    winevt_rc.WinevtResourcesHelper.CloseDatabaseReaders()
+
+    database_readers = winevt_rc.WinevtResourcesHelper._GetDatabaseReaders()
+    self.assertEqual(database_readers, {})
+
+  def testGetMessageStringLookupKey(self):
+    """Tests the _GetMessageStringLookupKey function."""
+    test_helper = winevt_rc.WinevtResourcesHelper(None, None, 0x00000409)
+
+    lookup_key = test_helper._GetMessageStringLookupKey(
+        '{15a7a4f8-0072-4eab-abad-f98a4d666aed}',
+        'Microsoft-Windows-Dhcp-Client', 0xb00003ed, None)
+    expected_lookup_key = (
+        '{15a7a4f8-0072-4eab-abad-f98a4d666aed}', 0xb00003ed, None)
+    self.assertEqual(lookup_key, expected_lookup_key)
+
+    lookup_key = test_helper._GetMessageStringLookupKey(
+        None, 'Microsoft-Windows-Dhcp-Client', 0xb00003ed, 1)
+    self.assertEqual(
+        lookup_key, ('Microsoft-Windows-Dhcp-Client', 0xb00003ed, 1))
+
+    lookup_key = test_helper._GetMessageStringLookupKey(
+        None, None, 0xb00003ed, None)
+    self.assertIsNone(lookup_key)
+
+  def testGetWinevtRcDatabaseReader(self):
+    """Tests the _GetWinevtRcDatabaseReader function."""
+    test_helper1 = winevt_rc.WinevtResourcesHelper(
+        None, self._temp_directory, 0x00000409)
+    test_helper2 = winevt_rc.WinevtResourcesHelper(
+        None, self._temp_directory, 0x00000409)
+
+    database_reader1 = test_helper1._GetWinevtRcDatabaseReader()
+    self.assertIsInstance(
+        database_reader1, winevt_rc.WinevtResourcesSqlite3DatabaseReader)
+
+    database_reader2 = test_helper2._GetWinevtRcDatabaseReader()
+    self.assertIs(database_reader2, database_reader1)
+
+    # Database readers are not shared across threads, including threads that
+    # are assigned the identifier of a thread that has exited.
+    thread_database_readers = []
+
+    def _GetThreadDatabaseReader():
+      """Retrieves a database reader in a separate thread."""
+      test_helper = winevt_rc.WinevtResourcesHelper(
+          None, self._temp_directory, 0x00000409)
+      database_reader = test_helper._GetWinevtRcDatabaseReader()
+      thread_database_readers.append(database_reader)
+
+      database_reader.Close()
+
+    for _ in range(3):
+      thread = threading.Thread(target=_GetThreadDatabaseReader)
+      thread.start()
+      thread.join()
+
+    thread_database_readers.append(database_reader1)
+
+    database_reader_identifiers = {
+        id(database_reader) for database_reader in thread_database_readers}
+    self.assertEqual(len(database_reader_identifiers), 4)
+
+    message_string = database_reader1.GetMessage(
+        'Test', 0x00000409, 0x00000001)
+    self.assertEqual(message_string, 'Test {0:s}')
+
+    # A database that cannot be opened is cached as such.
+    with shared_test_lib.TempDirectory() as temp_directory:
+      test_helper = winevt_rc.WinevtResourcesHelper(
+          None, temp_directory, 0x00000409)
+
+      database_reader = test_helper._GetWinevtRcDatabaseReader()
+      self.assertIsNone(database_reader)
+
+      with mock.patch.object(
+          winevt_rc.WinevtResourcesHelper,
+          '_OpenWinevtRcDatabaseReader') as open_database_reader:
+        test_helper = winevt_rc.WinevtResourcesHelper(
+            None, temp_directory, 0x00000409)
+
+        database_reader = test_helper._GetWinevtRcDatabaseReader()
+        self.assertIsNone(database_reader)
+
+        open_database_reader.assert_not_called()
+
   def testGetWinevtRcDatabaseMessageString(self):
     """Tests the _GetWinevtRcDatabaseMessageString function."""
     database_path = self._GetTestFilePath(['winevt-rc.db'])
@@ -134,6 +566,29 @@ class WinevtResourcesHelperTest(shared_test_lib.BaseTestCase):
         'Microsoft-Windows-Dhcp-Client', 0xb00003ed, None)
     self.assertEqual(message_string, expected_message_string)
 
+  def testGetMessageStringWithTestDatabase(self):
+    """Tests the GetMessageString function with the test database."""
+    test_helper = winevt_rc.WinevtResourcesHelper(
+        None, self._temp_directory, 0x00000409)
+
+    message_string = test_helper.GetMessageString(
+        None, 'Test', 0x00000001, None)
+    self.assertEqual(message_string, 'Test {0:s}')
+
+    # Message strings that are not available are cached as such.
+    for message_identifier in (0x00000002, 0x00000005, 0xffffffff):
+      message_string = test_helper.GetMessageString(
+          None, 'Test', message_identifier, None)
+      self.assertIsNone(message_string)
+
+      message_string = test_helper._GetCachedMessageString(
+          ('Test', message_identifier, None))
+      self.assertIs(message_string, test_helper._MESSAGE_STRING_NOT_AVAILABLE)
+
+      message_string = test_helper.GetMessageString(
+          None, 'Test', message_identifier, None)
+      self.assertIsNone(message_string)
+
 
 if __name__ == '__main__':
   unittest.main()
@@ -4,6 +4,9 @@
 
 import unittest
 
+from dfvfs.helpers import fake_file_system_builder
+
+from plaso.parsers import text_parser
 from plaso.parsers.text_plugins import winfirewall
 
 from tests.parsers.text_plugins import test_lib
@@ -12,6 +15,107 @@ from tests.parsers.text_plugins import test_lib
 class WinFirewallLogTextPluginTest(test_lib.TextPluginTestCase):
   """Tests for the Windows firewall log text parser plugin."""
 
+  # pylint: disable=protected-access
+
+  _HEADER = (
+      b'#Version: 1.5\n'
+      b'#Software: Microsoft Windows Firewall\n'
+      b'#Time Format: Local\n')
+
+  def _ParseTextWithPlugin(self, data, plugin):
+    """Parses text data as a Windows firewall log file.
+
+    Args:
+      data (bytes): data of the Windows firewall log file.
+      plugin (TextPlugin): text log file plugin.
+
+    Returns:
+      FakeStorageWriter: storage writer.
+    """
+    file_system_builder = fake_file_system_builder.FakeFileSystemBuilder()
+    file_system_builder.AddFile('/pfirewall.log', data)
+
+    file_entry = file_system_builder.file_system.GetFileEntryByPath(
+        '/pfirewall.log')
+
+    storage_writer = self._CreateStorageWriter()
+    parser_mediator = self._CreateParserMediator(
+        storage_writer, file_entry=file_entry)
+
+    file_object = file_entry.GetFileObject()
+    text_reader = text_parser.EncodedTextReader(file_object)
+    text_reader.ReadLines()
+
+    result = plugin.CheckRequiredFormat(parser_mediator, text_reader)
+    self.assertTrue(result)
+
+    plugin.Process(parser_mediator, file_object=file_object)
+
+    return storage_writer
+
+  def testCheckRequiredFormat(self):
+    """Tests for the CheckRequiredFormat method."""
+    plugin = winfirewall.WinFirewallLogTextPlugin()
+
+    file_system_builder = fake_file_system_builder.FakeFileSystemBuilder()
+    file_system_builder.AddFile('/header.log', self._HEADER)
+    file_system_builder.AddFile('/no_comment.log', (
+        b'2005-04-11 08:05:57 DROP UDP 123.45.78.90 255.255.255.255 631 631 '
+        b'59 - - - - - - - RECEIVE\n'))
+    file_system_builder.AddFile('/large_header.log', b''.join([
+        b'#Version: 1.5\n', b'#Fields: ' + (b'A' * 4096) + b'\n',
+        b'#Software: Microsoft Windows Firewall\n']))
+
+    for path, expected_result in (
+        ('/header.log', True),
+        ('/no_comment.log', False),
+        ('/large_header.log', False)):
+      file_entry = file_system_builder.file_system.GetFileEntryByPath(path)
+
+      parser_mediator = self._CreateParserMediator(None, file_entry=file_entry)
+
+      file_object = file_entry.GetFileObject()
+      text_reader = text_parser.EncodedTextReader(file_object)
+      text_reader.ReadLines()
+
+      result = plugin.CheckRequiredFormat(parser_mediator, text_reader)
+      self.assertEqual(result, expected_result)
+
+  def testGetLogLineStructure(self):
+    """Tests the _GetLogLineStructure function."""
+    plugin = winfirewall.WinFirewallLogTextPlugin()
+
+    log_line_structure, undefined_fields = plugin._GetLogLineStructure(
+        'date time src-ip bogus src-ip')
+    self.assertEqual(undefined_fields, ('bogus', ))
+
+    # The value of the last occurrence of a duplicate field is stored.
+    structure = log_line_structure.parse_string(
+        '2005-04-11 08:05:57 10.0.0.1 value 10.0.0.2\n')
+    self.assertEqual(structure.get('source_ip'), '10.0.0.2')
+
+  def testParseTimeElements(self):
+    """Tests the _ParseTimeElements function."""
+    plugin = winfirewall.WinFirewallLogTextPlugin()
+
+    structure = plugin._LOG_LINE_1_5.parse_string(
+        '2005-04-11 08:05:57 DROP UDP 123.45.78.90 255.255.255.255 631 631 '
+        '59 - - - - - - - RECEIVE\n')
+
+    date_time = plugin._ParseTimeElements(structure)
+    self.assertIsNotNone(date_time)
+    self.assertFalse(date_time.is_local_time)
+
+    # The date and time value of the previous log line is reused.
+    reused_date_time = plugin._ParseTimeElements(structure)
+    self.assertIs(reused_date_time, date_time)
+
+    plugin._use_local_time = True
+
+    date_time = plugin._ParseTimeElements(structure)
+    self.assertIsNot(date_time, reused_date_time)
+    self.assertTrue(date_time.is_local_time)
+
   def testProcess(self):
     """Tests the Process function."""
     plugin = winfirewall.WinFirewallLogTextPlugin()
@@ -46,6 +150,61 @@ class WinFirewallLogTextPluginTest(test_lib.TextPluginTestCase):
     event_data = storage_writer.GetAttributeContainerByIndex('event_data', 7)
     self.CheckEventData(event_data, expected_event_values)
 
+  def testProcessWithCustomFields(self):
+    """Tests the Process function with custom fields metadata."""
+    plugin = winfirewall.WinFirewallLogTextPlugin()
+    storage_writer = self._ParseTextWithPlugin(b''.join([
+        self._HEADER.replace(b'\n', b'\r\n'),
+        b'#Fields: date time action protocol src-ip dst-ip src-port dst-port '
+        b'size pid path pid\r\n',
+        b'2021-03-01 10:40:27 ALLOW UDP fe80::1c2b:3d4e:5f60:7182 ff02::fb '
+        b'5353 5353 0 123 RECEIVE 456\r\n',
+        b'2021-03-01 10:40:28 DROP ICMP 192.168.1.2 192.168.1.1 - - - - '
+        b'SEND -\r\n']), plugin)
+
+    number_of_event_data = storage_writer.GetNumberOfAttributeContainers(
+        'event_data')
+    self.assertEqual(number_of_event_data, 2)
+
+    # The pid field has no definition and occurs twice.
+    number_of_warnings = storage_writer.GetNumberOfAttributeContainers(
+        'extraction_warning')
+    self.assertEqual(number_of_warnings, 2)
+
+    number_of_warnings = storage_writer.GetNumberOfAttributeContainers(
+        'recovery_warning')
+    self.assertEqual(number_of_warnings, 0)
+
+    expected_event_values = {
+        'action': 'ALLOW',
+        'data_type': 'windows:firewall_log:entry',
+        'destination_ip': 'ff02::fb',
+        'destination_port': 5353,
+        'last_written_time': '2021-03-01T10:40:27',
+        'packet_size': 0,
+        'path': 'RECEIVE',
+        'protocol': 'UDP',
+        'source_ip': 'fe80::1c2b:3d4e:5f60:7182',
+        'source_port': 5353}
+
+    event_data = storage_writer.GetAttributeContainerByIndex('event_data', 0)
+    self.CheckEventData(event_data, expected_event_values)
+
+    expected_event_values = {
+        'action': 'DROP',
+        'data_type': 'windows:firewall_log:entry',
+        'destination_ip': '192.168.1.1',
+        'destination_port': None,
+        'last_written_time': '2021-03-01T10:40:28',
+        'packet_size': None,
+        'path': 'SEND',
+        'protocol': 'ICMP',
+        'source_ip': '192.168.1.2',
+        'source_port': None}
+
+    event_data = storage_writer.GetAttributeContainerByIndex('event_data', 1)
+    self.CheckEventData(event_data, expected_event_values)
+
 
 if __name__ == '__main__':
   unittest.main()